@@ -0,0 +1,200 @@
+# cython: language_level=3, boundscheck=False, wraparound=False
+"""
+Compiled versions of the minifier and url substitution from resolver.py.
+Both work on utf-8 encoded bytes and give the same output as the pure python versions
+"""
+from cpython.bytearray cimport PyByteArray_AS_STRING, PyByteArray_GET_SIZE, PyByteArray_Resize
+from cpython.bytes cimport PyBytes_AS_STRING, PyBytes_FromStringAndSize, PyBytes_GET_SIZE
+from libc.stdlib cimport free, malloc
+from libc.string cimport memchr, memcmp, memcpy
+
+
+cdef inline bint _is_space(unsigned char c) noexcept nogil:
+    return c == 32 or 9 <= c <= 13  # Same set as \s for bytes patterns
+
+
+cdef inline bint _is_quote(unsigned char c) noexcept nogil:
+    return c == 34 or c == 39
+
+
+cdef inline bint _is_url(const unsigned char *p, Py_ssize_t i, Py_ssize_t n) noexcept nogil:
+    return i + 3 < n and (p[i] | 0x20) == 117 and (p[i + 1] | 0x20) == 114 and (p[i + 2] | 0x20) == 108 and p[i + 3] == 40  # url( in any case
+
+
+cdef Py_ssize_t _find(const unsigned char *p, Py_ssize_t n, Py_ssize_t i, unsigned char c) noexcept nogil:
+    cdef const unsigned char *found
+    if i >= n:
+        return -1
+    found = <const unsigned char *> memchr(p + i, c, n - i)
+    if found == NULL:
+        return -1
+    return found - p
+
+
+cdef Py_ssize_t _find_either(const unsigned char *p, Py_ssize_t n, Py_ssize_t i, unsigned char a, unsigned char b) noexcept nogil:
+    while i < n:
+        if p[i] == a or p[i] == b:
+            return i
+        i += 1
+    return -1
+
+
+cdef Py_ssize_t _find_comment_end(const unsigned char *p, Py_ssize_t n, Py_ssize_t i) noexcept nogil:
+    while i < n - 1:
+        i = _find(p, n - 1, i, 42)  # Looking for the * of */
+        if i == -1:
+            return -1
+        if p[i + 1] == 47:
+            return i
+        i += 1
+    return -1
+
+
+cdef Py_ssize_t _string_end(const unsigned char *p, Py_ssize_t n, Py_ssize_t start) noexcept nogil:
+    cdef unsigned char quote = p[start]
+    cdef Py_ssize_t end = start + 1
+    cdef Py_ssize_t backslashes
+    while True:
+        end = _find(p, n, end, quote)
+        if end == -1:
+            return n
+        backslashes = 0
+        while p[end - 1 - backslashes] == 92:
+            backslashes += 1
+        if backslashes % 2 == 0:
+            return end + 1
+        end += 1  # Escaped quote, the string keeps going
+
+
+cdef void _append(bytearray out, const unsigned char *src, Py_ssize_t size) except *:
+    cdef Py_ssize_t old_size = PyByteArray_GET_SIZE(out)
+    if size <= 0:
+        return
+    PyByteArray_Resize(out, old_size + size)
+    memcpy(PyByteArray_AS_STRING(out) + old_size, src, size)
+
+
+def minify_css(bytes css) -> bytes:
+    """
+    Minifies the given css.
+    Strips comments and collapses whitespace in a single pass, leaving strings and url()s untouched
+    """
+    cdef const unsigned char *p = <const unsigned char *> PyBytes_AS_STRING(css)
+    cdef Py_ssize_t n = PyBytes_GET_SIZE(css)
+    cdef unsigned char *out = <unsigned char *> malloc(n + 1)  # Minifying never makes anything longer
+    cdef Py_ssize_t length = 0
+    cdef Py_ssize_t i = 0
+    cdef Py_ssize_t end
+    cdef Py_ssize_t first = 0
+    cdef unsigned char c
+
+    if out == NULL:
+        raise MemoryError()
+
+    try:
+        with nogil:
+            while i < n:
+                c = p[i]
+                if c == 47 and i + 1 < n and p[i + 1] == 42:  # /*
+                    end = _find_comment_end(p, n, i + 2)
+                    if end == -1:
+                        memcpy(out + length, p + i, n - i)  # Unterminated comment, leaving it alone
+                        length += n - i
+                        break
+                    i = end + 2
+                elif _is_quote(c):
+                    end = _string_end(p, n, i)
+                    memcpy(out + length, p + i, end - i)
+                    length += end - i
+                    i = end
+                elif _is_space(c):
+                    if length > 0 and out[length - 1] != 32:
+                        out[length] = 32
+                        length += 1
+                    i += 1
+                    while i < n and _is_space(p[i]):
+                        i += 1
+                elif _is_url(p, i, n):
+                    memcpy(out + length, p + i, 4)
+                    length += 4
+                    i += 4
+                    if i < n and not _is_quote(p[i]) and not _is_space(p[i]):  # Quoted urls get handled as strings, unquoted ones are copied up to the closing bracket
+                        end = _find(p, n, i, 41)
+                        if end == -1:
+                            end = n
+                        memcpy(out + length, p + i, end - i)
+                        length += end - i
+                        i = end
+                else:
+                    out[length] = c
+                    length += 1
+                    i += 1
+
+            while first < length and _is_space(out[first]):
+                first += 1
+            while length > first and _is_space(out[length - 1]):
+                length -= 1
+
+        return PyBytes_FromStringAndSize(<char *> out + first, length - first)
+    finally:
+        free(out)
+
+
+def substitute_urls(bytes css, dict replacements) -> bytes:
+    """
+    Swaps the target of every url() in the css that has an entry in `replacements`, in a single pass.
+    Matches the same urls as `_RE_URL` in resolver.py (so none inside @import rules), the `url(` and any quotes around the target are kept
+    """
+    cdef const unsigned char *p = <const unsigned char *> PyBytes_AS_STRING(css)
+    cdef Py_ssize_t n = PyBytes_GET_SIZE(css)
+    cdef bytearray out = bytearray()
+    cdef Py_ssize_t copied = 0
+    cdef Py_ssize_t i = 0
+    cdef Py_ssize_t start
+    cdef Py_ssize_t end
+    cdef Py_ssize_t close
+    cdef object replacement
+    cdef const unsigned char[::1] data
+
+    while i < n:
+        i = _find_either(p, n, i, 117, 64)  # Looking for the u of url( or the @ of @import
+        if i == -1:
+            break
+        if p[i] == 64:
+            if i + 7 <= n and memcmp(p + i + 1, b"import", 6) == 0:
+                close = _find(p, n, i + 7, 59)
+                if close != -1:
+                    i = close + 1  # Skipping the whole rule, its url isn't an asset
+                    continue
+            i += 1
+            continue
+        if not (i + 3 < n and p[i + 1] == 114 and p[i + 2] == 108 and p[i + 3] == 40):
+            i += 1
+            continue
+
+        start = i + 4
+        if start < n and _is_quote(p[start]):
+            start += 1
+        close = _find(p, n, start, 41)
+        if close == -1:
+            break  # No closing bracket anywhere after this, so no later url() can match either
+        if _find(p, close, start, 10) != -1:
+            i += 1  # The regex version doesn't match across lines either
+            continue
+        end = close
+        if end > start and _is_quote(p[end - 1]):
+            end -= 1
+
+        replacement = replacements.get(PyBytes_FromStringAndSize(<char *> p + start, end - start))
+        if replacement is not None:
+            data = replacement  # bytes, or the bytearray a data uri gets built in, neither gets copied
+            _append(out, p + copied, start - copied)
+            if data.shape[0] > 0:
+                _append(out, &data[0], data.shape[0])
+            copied = end
+        i = close + 1
+
+    if copied == 0:
+        return css
+    _append(out, p + copied, n - copied)
+    return bytes(out)
@@ -1,4 +1,11 @@
-from setuptools import setup, find_packages
+from setuptools import Extension, setup, find_packages
+
+try:
+    from Cython.Build import cythonize
+except ImportError:
+    ext_modules = [] # Without Cython the pure python minifier and url substitution get used instead
+else:
+    ext_modules = cythonize([Extension('css_resolver._css_resolver_c', ['css_resolver/_css_resolver_c.pyx'], optional=True)])
 
 with open('README.rst', 'r') as file:
     long_description = file.read()
@@ -9,10 +16,15 @@ setup(
     long_description = long_description,
     long_description_content_type='text/x-rst',
     packages=find_packages(),
+    ext_modules=ext_modules,
     install_requires=[
         'requests',
         'argparse',
         'colorama',
         'beautifulsoup4'
     ],
+    extras_require={
+        'fast': ['pybase64', 'rcssmin'],
+        'http2': ['httpx[http2]']
+    },
 )
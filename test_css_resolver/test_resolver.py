@@ -1,12 +1,42 @@
 import argparse
-import base64
+import atexit
+import codecs
+import contextlib
+import contextvars
+import hashlib
 import os
 import re
-from typing import List
+import sys
+import threading
+import urllib.parse
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import AnyStr, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
 
 import colorama
 import requests
 from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import httpx # HTTP/2 capable client, installed with the `http2` extra
+except ImportError:
+    httpx = None
+
+try:
+    import rcssmin # C minifier, installed with the `fast` extra
+except ImportError:
+    rcssmin = None
+
+try:
+    from css_resolver import _css_resolver_c # Compiled minifier and url substitution, only there if the extension got built
+except ImportError:
+    _css_resolver_c = None
+
+try:
+    import pybase64 as _b64 # SIMD accelerated base64, installed with the `fast` extra
+except ImportError:
+    import base64 as _b64
 
 filepath = ''  # The css file to convert. Can be a URL.
 output_path = 'output.css' # The output filepath.
@@ -14,139 +44,532 @@ log_method = 1  # 0 for none, 1 for print, 2 for file, 3 for both print and file
 log_level = 1  # 0 for none, 1 for normal, 2 for verbose
 user_agent = None  # The user agent to use for requesting assets
 minify = True # Whether to minify the css
+use_rcssmin = False  # Whether to minify with rcssmin if it's installed. Much faster, but it also strips whitespace the built-in minifier keeps
+base64_text_assets = False  # Whether to base64 svg and text assets too instead of url-encoding them
+use_httpx = True  # Whether to download with httpx if it's installed, over HTTP/2 when h2 is there too. Falls back to requests otherwise
+fetch_workers = 8  # How many urls to download at the same time
 
 headers = {'User-Agent': user_agent} if user_agent else None  # This should not be changed
 
+_RE_MINIFY_TOKEN = re.compile(rb'/\*|[\'"]|\s+|url\(', re.IGNORECASE) # Everything the minifier has to look at, the text in between is copied as is
+_RE_IMPORT = re.compile(rb'@import\s+(?:url\()?[\'"]?([^\'")]+)[\'"]?\)?;') # Used for both finding and replacing imports, so every url found is exactly the one that gets looked up
+_RE_URL = re.compile(rb'@import[^;]*;|url\([\'"]?(.*?)[\'"]?\)') # @import rules that are still around (media queries, failed downloads) get matched whole with no url, so they're never treated as assets
+_RE_CHARSET = re.compile(rb'@charset\s+[\'"]([^\'"]+)[\'"]\s*;\s*') # Only counts at the very start of a file
+_RE_MEDIA_TYPE = re.compile(r'[\w.+-]+/[\w.+-]+', re.ASCII) # What's allowed through into a data uri, everything in it is safe in any url()
+_RE_CHARSET_NAME = re.compile(r'[\w.:+-]+', re.ASCII) # Same idea for the charset that can come along with it
+_B64_CHUNK = 57 * 1024  # Read size for streamed assets. A multiple of 3, so each chunk base64 encodes without padding and the pieces join up
+
+
+class _Caches(NamedTuple):
+    """
+    Everything one top level call caches, see _cache_scope()
+    """
+    fetch: Dict[str, Future]  # url -> Future of (status_code, content_type, content)
+    imports: Dict[str, bytes]  # import url -> fully resolved css
+    assets: Dict[str, Future]  # asset url -> Future of (status_code, content_type, data uri)
+    resolved: Dict[bytes, bytes]  # sha1 of some css -> that css fully resolved
+
+
+_session = None  # Shared across every request so connections get reused, see _get_session(). Either a httpx.Client or a requests.Session
+_caches: contextvars.ContextVar = contextvars.ContextVar('_caches', default=None)  # The _Caches of the top level call this context belongs to
+_resolving: contextvars.ContextVar = contextvars.ContextVar('_resolving', default=frozenset())  # The import urls being resolved above the current one, for catching import cycles
+_cache_lock = threading.Lock()
+_request_slots = threading.BoundedSemaphore(64)  # Caps the downloads in flight across every level of the import tree, same as the connection pool size
+_log_file = None  # Opened by the first line that gets logged to the file and kept open until exit
+_log_lock = threading.Lock()
+
+_FG_GREEN = colorama.Fore.GREEN
+_FG_MAGENTA = colorama.Fore.LIGHTMAGENTA_EX
+_FG_CYAN = colorama.Fore.CYAN
+_RESET = colorama.Style.RESET_ALL
+
+
+def _get_session() -> Union['httpx.Client', requests.Session]:
+    global _session
+    if _session is None and use_httpx and httpx is not None:
+        limits = httpx.Limits(max_keepalive_connections=16, max_connections=64)
+        try:
+            transport = httpx.HTTPTransport(http2=True, limits=limits, retries=3) # All requests to a host share one multiplexed connection
+        except ImportError:
+            transport = httpx.HTTPTransport(limits=limits, retries=3) # h2 isn't installed, so plain keep-alive it is
+        _session = httpx.Client(transport=transport, follow_redirects=True) # Both clients have the same get() and response attributes we use, so nothing else has to care which one this is
+    elif _session is None:
+        _session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=64, max_retries=Retry(total=3, backoff_factor=0.3)) # Mounted once, mounting per request would throw the pool away every time
+        _session.mount('http://', adapter)
+        _session.mount('https://', adapter)
+    return _session
+
+
+def _fetch(url: str) -> Tuple[int, str, bytes]:
+    if log_level == 2:
+        _log(f'Requesting {url}...', 'verbose')
+
+    with _request_slots:
+        response = _get_session().get(url, headers=headers, timeout=10)
+    return response.status_code, response.headers.get('content-type'), response.content
+
+
+def _cached(cache: Dict[str, Future], url: str, fetch: Callable[[str], Tuple[int, str, bytes]]) -> Tuple[int, str, bytes]:
+    """
+    Gives whatever `fetch(url)` gives, only calling it once per url in `cache`.
+    A url that's still downloading gets waited on instead of downloaded a second time
+    """
+    with _cache_lock:
+        future = cache.get(url)
+        downloading = future is None
+        if downloading:
+            future = cache[url] = Future()
+    if not downloading:
+        if log_level == 2:
+            _log(f'Using cached {url}...', 'verbose')
+        return future.result() # Raises whatever the download raised, same as downloading it here would have
+
+    try:
+        result = fetch(url)
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    future.set_result(result)
+    return result
+
+
+def _cached_get(url: str) -> Tuple[int, str, bytes]:
+    return _cached(_caches.get().fetch, url, _fetch)
+
+
+@contextlib.contextmanager
+def _stream(url: str) -> Iterator[Tuple[int, str, Iterator[bytes]]]:
+    """
+    Starts a download without reading the body yet.
+    Gives the status code, content type and an iterator over the body in `_B64_CHUNK` sized pieces
+    """
+    session = _get_session()
+    if isinstance(session, requests.Session):
+        with session.get(url, headers=headers, timeout=10, stream=True) as response:
+            yield response.status_code, response.headers.get('content-type'), response.iter_content(_B64_CHUNK)
+    else:
+        with session.stream('GET', url, headers=headers, timeout=10) as response:
+            yield response.status_code, response.headers.get('content-type'), response.iter_bytes(_B64_CHUNK)
+
+
+def _fetch_asset(url: str) -> Tuple[int, str, bytes]:
+    """
+    Downloads an asset straight into its data uri.
+    Gives `(status_code, content_type, data_uri)`, the data uri is empty if the download failed
+    """
+    return _cached(_caches.get().assets, url, _download_asset)
+
+
+def _download_asset(url: str) -> Tuple[int, str, bytes]:
+    if log_level == 2:
+        _log(f'Requesting {url}...', 'verbose')
+
+    with _request_slots, _stream(url) as (status_code, content_type, chunks):
+        data_uri = _data_uri(content_type, chunks) if status_code == 200 else b''
+    return status_code, content_type, data_uri
+
+
+@contextlib.contextmanager
+def _cache_scope() -> Iterator[None]:
+    """
+    Gives the top level public call its own empty caches, which get dropped again when it returns.
+    Calls nested inside it (and the workers it starts, they run in copies of its context) share them instead.
+    So calls running at the same time never see each other's downloads, and nothing stays in memory afterwards
+    """
+    if _caches.get() is not None:
+        yield
+        return
+
+    token = _caches.set(_Caches({}, {}, {}, {}))
+    try:
+        yield
+    finally:
+        _caches.reset(token)
+
+
+def _fetch_all(urls: List[str], fetch: Callable[[str], Tuple[int, str, bytes]]) -> Dict[str, Union[Tuple[int, str, bytes], Exception]]:
+    """
+    Downloads all the given urls concurrently with `fetch`.
+    Maps every url to whatever `fetch` gave back for it, or to the exception it raised
+    """
+    results = {}
+    if not urls:
+        return results
+
+    _get_session() # Creating the session up front so the workers don't race to create it
+    with ThreadPoolExecutor(max_workers=fetch_workers) as executor:
+        futures = {url: executor.submit(contextvars.copy_context().run, fetch, url) for url in urls} # Run in copies of our context so the workers see this call's caches
+        for url, future in futures.items():
+            try:
+                results[url] = future.result()
+            except Exception as e:
+                results[url] = e
+
+    return results
+
 
 def _log(content: str, prefix: str = None) -> None:
-    if log_method in [2, 3]:
-        with open('css_extractor_output.log', 'a', encoding='UTF-8') as f:
-            f.write(content + '\n')
-    if log_method in [1, 3]:
-        if prefix is not None:
-            content = f'{colorama.Fore.LIGHTMAGENTA_EX}[{prefix.upper()}]{colorama.Style.RESET_ALL}: {colorama.Fore.CYAN}{content}{colorama.Style.RESET_ALL}'
+    global _log_file
+    if log_method == 0:
+        return
+
+    line = None
+    if log_method in [1, 3]: # Whole line gets built first so lines from different threads can't get mixed together
+        if not sys.stdout.isatty(): # No point building colors nobody will see
+            if prefix is not None:
+                line = f'[LOG]: [{prefix.upper()}]: {content}\n'
+            else:
+                line = f'[LOG]: {content}\n'
+        elif prefix is not None:
+            line = f'{_FG_GREEN}[LOG]{_RESET}: {_FG_MAGENTA}[{prefix.upper()}]{_RESET}: {_FG_CYAN}{content}{_RESET}\n'
         else:
-            content = f'{colorama.Fore.CYAN}{content}{colorama.Style.RESET_ALL}'
-        print(f'{colorama.Fore.GREEN}[LOG]{colorama.Style.RESET_ALL}:', content)
+            line = f'{_FG_GREEN}[LOG]{_RESET}: {_FG_CYAN}{content}{_RESET}\n'
+
+    with _log_lock:
+        if log_method in [2, 3]:
+            if _log_file is None:
+                _log_file = open('css_extractor_output.log', 'a', encoding='UTF-8', buffering=1) # Line buffered so lines still show up as they're logged
+                atexit.register(_log_file.close)
+            _log_file.write(content + '\n')
+        if line is not None:
+            sys.stdout.write(line)
 
 
-def test_minify_css(css: str) -> str:
+def _content_type_charset(content_type: Optional[str]) -> Optional[str]:
     """
-    Minifies the given css
+    Gives the charset parameter of a Content-Type header without any quotes, or None if there isn't one
     """
-    css = re.sub(r'/\*[^*]*\*+(?:[^*/][^*]*\*+)*/', '', css)
-    css = re.sub(r'\s+', ' ', css)
+    for param in (content_type or '').split(';')[1:]:
+        name, _, value = param.partition('=')
+        if name.strip().lower() == 'charset':
+            return value.strip().strip('"\'')
+    return None
 
-    css = css.strip()
 
+def _to_utf8(css: bytes, content_type: Optional[str]) -> bytes:
+    """
+    Re-encodes downloaded or loaded css as utf-8 without going through any charset guessing.
+    The encoding comes from a utf-8 BOM, then the Content-Type charset, then the @charset rule, and is utf-8 otherwise.
+    The BOM and @charset rule get dropped, neither one is valid once the css is embedded in the middle of another file
+    """
+    charset = None
+    if css.startswith(codecs.BOM_UTF8):
+        css = css[len(codecs.BOM_UTF8):]
+        charset = 'utf-8'
+    else:
+        charset = _content_type_charset(content_type)
+
+    match = _RE_CHARSET.match(css)
+    if match is not None:
+        charset = charset or match.group(1).decode('ascii', errors='replace')
+        css = css[match.end():]
+
+    try:
+        codec = codecs.lookup(charset or 'utf-8').name
+    except LookupError:
+        codec = 'utf-8' # Unknown charset, utf-8 is still the best guess
+    if codec != 'utf-8':
+        css = css.decode(codec, errors='replace').encode('utf-8')
     return css
 
 
-def test_import_extractor(css: str) -> List[str]:
+def _data_uri(content_type: str, chunks: Iterable[bytes]) -> Union[bytes, bytearray]:
+    """
+    Builds a data uri out of the given pieces of content.
+    SVGs and text get url-encoded unless `base64_text_assets` is set, everything else is base64 encoded as the pieces come in
     """
-    Extracts import URLs from a css file
+    charset = _content_type_charset(content_type)
+    content_type = (content_type or '').partition(';')[0].strip().lower()
+    if not _RE_MEDIA_TYPE.fullmatch(content_type):
+        content_type = 'application/octet-stream'
+    if charset and _RE_CHARSET_NAME.fullmatch(charset):
+        content_type += f';charset={charset}' # Only the type and an unquoted charset make it in, quotes or spaces from the header would break the url() it ends up in
+    if not base64_text_assets and content_type.startswith(('image/svg+xml', 'text/')):
+        return b''.join([b'data:', content_type.encode('ascii'), b',', urllib.parse.quote(b''.join(chunks), safe='').encode('ascii')]) # Smaller than base64 and still gzips well, and the charset stays whatever the server said it was
+
+    data_uri = bytearray(b'data:' + content_type.encode('ascii') + b';base64,')
+    leftover = b''
+    for chunk in chunks: # Only ever holding one raw chunk next to the encoded data, instead of the whole file plus its encoding
+        if leftover:
+            chunk = leftover + chunk
+        usable = len(chunk) - len(chunk) % 3
+        data_uri += _b64.b64encode(memoryview(chunk)[:usable])
+        leftover = chunk[usable:]
+    if leftover:
+        data_uri += _b64.b64encode(leftover)
+    return data_uri # Handed back as the bytearray it was built in, turning it into bytes would copy the whole thing once more
+
+
+def test_minify_css(css: AnyStr) -> AnyStr:
     """
-    imports = re.compile(r'@import\s+(url\()?[\'"]?(.*?)[\'"]?\)?;').findall(css)
+    Minifies the given css.
+    Strips comments and collapses whitespace in a single pass, leaving strings and url()s untouched
+    """
+    if isinstance(css, str):
+        return test_minify_css(css.encode('utf-8')).decode('utf-8', errors='replace') # Works on bytes underneath, str in still gives str out
+    if use_rcssmin and rcssmin is not None:
+        return rcssmin.cssmin(css)
+    if _css_resolver_c is not None:
+        return _css_resolver_c.minify_css(css)
+
+    minified = []
+    i = 0
+    length = len(css)
+
+    while i < length:
+        match = _RE_MINIFY_TOKEN.search(css, i)
+        if match is None:
+            minified.append(css[i:])
+            break
+
+        start = match.start()
+        if start > i:
+            minified.append(css[i:start])
+
+        token = match.group()
+        if token == b'/*':
+            end = css.find(b'*/', start + 2)
+            if end == -1:
+                minified.append(css[start:]) # Unterminated comment, leaving it alone
+                break
+            i = end + 2
+        elif token in (b'"', b"'"):
+            end = start + 1
+            while True:
+                end = css.find(token, end)
+                if end == -1:
+                    end = length
+                    break
+                backslashes = 0
+                while css[end - 1 - backslashes:end - backslashes] == b'\\':
+                    backslashes += 1
+                if backslashes % 2 == 0:
+                    end += 1
+                    break
+                end += 1 # Escaped quote, the string keeps going
+            minified.append(css[start:end])
+            i = end
+        elif token[:1] in (b'u', b'U'):
+            minified.append(token)
+            i = match.end()
+            if i < length and css[i:i + 1] not in (b'"', b"'") and not css[i:i + 1].isspace(): # Quoted urls get handled as strings, unquoted ones are copied up to the closing bracket
+                end = css.find(b')', i)
+                end = length if end == -1 else end
+                minified.append(css[i:end])
+                i = end
+        else:
+            if minified and minified[-1] != b' ':
+                minified.append(b' ')
+            i = match.end()
+
+    return b''.join(minified).strip()
+
+
+def test_import_extractor(css: Union[str, bytes]) -> List[str]:
+    """
+    Extracts the unique import URLs from a css file, in the order they first show up
+    """
+    if isinstance(css, str):
+        css = css.encode('utf-8')
+    imports = _RE_IMPORT.findall(css)
     import_urls = []
     for _import in imports:
-        import_urls.append(_import[1])
+        import_urls.append(_import.decode('utf-8', errors='replace'))
 
-    return import_urls
+    return list(dict.fromkeys(import_urls))
 
 
-def test_asset_extractor(css: str) -> List[str]:
+def test_asset_extractor(css: Union[str, bytes]) -> List[str]:
     """
-    Extracts all asset URLs from a css file
+    Extracts all unique asset URLs from a css file, in the order they first show up
     """
+    if isinstance(css, str):
+        css = css.encode('utf-8')
     if log_level in [1, 2]:
         _log('Extracting URLs...')
 
-    assets = re.compile(r'url\([\'"]?(.*?)[\'"]?\)').findall(css)
-    return assets
+    assets = [match.group(1).decode('utf-8', errors='replace') for match in _RE_URL.finditer(css) if match.group(1) is not None]
+    return list(dict.fromkeys(assets)) # A background reused by lots of selectors is still just one url to resolve
 
 
-def test_import_resolver(urls: List[str], css: str) -> str:
+def _resolve_import(url: str) -> Optional[Tuple[bytes, bool]]:
     """
-    Resolves and embeds all imports in a css file
+    Downloads and fully resolves a single import, returns None if that didn't work.
+    Otherwise gives `(resolved_css, cut)`, see _resolve_css()
     """
-    embedded = css
-
-    for url in urls:
-        if log_level == 2:
-            _log(f'Embedding content of {url}...', 'verbose')
-        try:
-            if url.startswith('/') and log_level in [1, 2]:
-                _log(f'Skipping broken import url: {url}')
-                continue # I might add something to attempt to guess the domain based on the other URLs later, but too much work for right now :3
-
+    _resolving.set(_resolving.get() | {url}) # Only changes the context this import runs in, see _embed_imports()
+    try:
+        status_code, content_type, content = _cached_get(url)
+        if status_code == 200:
             if log_level == 2:
-                _log(f'Requesting {url}...', 'verbose')
+                _log(f'Embedding content of {url}...', 'verbose')
+
+            content = _to_utf8(content, content_type)
+            resolved_content, cut = _resolve_css(content) # Making sure the imported css is fully resolved before adding it to our main file
+            if not cut:
+                with _cache_lock:
+                    _caches.get().imports[url] = resolved_content
+            return resolved_content, cut
+        elif log_level in [1, 2]:
+            _log(f"Failed to download: {url}", str(status_code))
+    except Exception as e:
+        if log_level in [1, 2]:
+            _log(f"Error embedding {url}", str(e))
 
-            response = requests.get(url, headers=headers)
-            if response.status_code == 200:
-                if log_level == 2:
-                    _log(f'Embedding {url}...', 'verbose')
+    return None
 
-                content = response.text
-                resolved_content = test_resolve_css(content) # Making sure the imported css is fully resolved before adding it to our main file
-                embedded = re.sub(fr'@import\s+(?:url\()?[\'"]?{re.escape(url)}[\'"]?\)?;', resolved_content, embedded) # Making sure that different ways of importing don't screw us up here
-                _log(f"Failed to download: {url}", str(response.status_code))
-        except Exception as e:
-            if log_level in [1, 2]:
-                _log(f"Error embedding {url}", str(e))
 
-    return embedded
+def test_import_resolver(urls: List[str], css: AnyStr) -> AnyStr:
+    """
+    Resolves and embeds all imports in a css file
+    """
+    if isinstance(css, str):
+        return test_import_resolver(urls, css.encode('utf-8')).decode('utf-8', errors='replace')
+    with _cache_scope():
+        return _embed_imports(urls, css)[0]
 
 
-def test_asset_resolver(urls: List[str], css: str) -> str:
+def _embed_imports(urls: List[str], css: bytes) -> Tuple[bytes, bool]:
+    resolved = {}
+    resolving = _resolving.get()
+    cut = False
+
+    fetch_urls = []
+    for url in dict.fromkeys(urls): # Every url only needs to be downloaded and embedded once
+        if url.startswith('/'):
+            if log_level in [1, 2]:
+                _log(f'Skipping broken import url: {url}')
+            continue # I might add something to attempt to guess the domain based on the other URLs later, but too much work for right now :3
+        if url in resolving:
+            if log_level in [1, 2]:
+                _log(f'Skipping circular import url: {url}')
+            resolved[url.encode('utf-8')] = b'' # Embedding it would mean resolving it again forever, and leaving the rule in would let the asset pass inline it instead
+            cut = True
+            continue
+
+        with _cache_lock:
+            cached = _caches.get().imports.get(url)
+        if cached is not None:
+            resolved[url.encode('utf-8')] = cached # Already resolved somewhere else in the import tree, no need to do it all again
+            continue
+        fetch_urls.append(url)
+
+    if fetch_urls:
+        _get_session() # Creating the session up front so the workers don't race to create it
+        with ThreadPoolExecutor(max_workers=fetch_workers) as executor: # Every import gets downloaded and resolved (imports of its own included) in its own worker
+            contexts = [contextvars.copy_context() for _ in fetch_urls] # Worker threads don't inherit context variables, so every import gets its own copy of ours
+            for url, result in zip(fetch_urls, executor.map(lambda context, url: context.run(_resolve_import, url), contexts, fetch_urls)):
+                if result is not None:
+                    resolved[url.encode('utf-8')] = result[0]
+                    cut = cut or result[1]
+
+    if not resolved:
+        return css, cut
+
+    return _RE_IMPORT.sub(lambda match: resolved.get(match.group(1), match.group(0)), css), cut # One pass over the css for every import, no matter how it was written
+
+
+def test_asset_resolver(urls: List[str], css: AnyStr) -> AnyStr:
     """
     Resolves all assets in the given css
     """
-    embedded = css
+    if isinstance(css, str):
+        return test_asset_resolver(urls, css.encode('utf-8')).decode('utf-8', errors='replace')
+    with _cache_scope():
+        return _embed_assets(urls, css)
+
 
-    for url in urls:
-        if 'data:' in url:
+def _embed_assets(urls: List[str], css: bytes) -> bytes:
+    resolved = {}
+
+    fetch_urls = []
+    for url in dict.fromkeys(urls): # Every url only needs to be downloaded and embedded once
+        if url.startswith('data:'):
             if log_level == 2:
                 _log(f'Skipping data url...', 'verbose')
             continue  # Skipping data urls because they're already embedded :3
-        try:
-            if url.startswith('/') and log_level in [1, 2]:
+        if url.startswith('/'):
+            if log_level in [1, 2]:
                 _log(f'Skipping broken asset url: {url}')
-                continue
+            continue
+        fetch_urls.append(url)
 
-            if log_level == 2:
-                _log(f'Requesting {url}...', 'verbose')
+    responses = _fetch_all(fetch_urls, _fetch_asset)
 
-            response = requests.get(url, headers=headers)
-            if response.status_code == 200:
+    for url in fetch_urls:
+        try:
+            response = responses[url]
+            if isinstance(response, Exception):
+                raise response
+
+            status_code, content_type, data_uri = response
+            if status_code == 200:
                 if log_level == 2:
                     _log(f'Embedding {url}...', 'verbose')
 
-                content_type = response.headers.get('content-type')
-                data = base64.b64encode(response.content).decode('utf-8') # Encoding the data into base64. For SVGs it would probaby be better just to use the raw content, but we might get other filetypes sometimes and I'm too lazy to make it check
-                embedded = embedded.replace(url, f"data:{content_type};base64,{data}")
+                resolved[url.encode('utf-8')] = data_uri
             elif log_level in [1, 2]:
-                _log(f"Failed to download: {url}", str(response.status_code))
+                _log(f"Failed to download: {url}", str(status_code))
         except Exception as e:
             if log_level in [1, 2]:
                 _log(f"Error embedding {url}", str(e))
 
-    return embedded
+    if not resolved:
+        return css
+
+    if _css_resolver_c is not None:
+        return _css_resolver_c.substitute_urls(css, resolved)
+    return _substitute_urls(css, resolved)
 
 
-def test_resolve_css(css: str) -> str:
+def _substitute_urls(css: bytes, replacements: Dict[bytes, bytes]) -> bytes:
     """
-    Fully resolves a css string.
+    Pure python version of `substitute_urls` from the compiled extension
     """
+    def _embed(match: re.Match) -> bytes:
+        data = replacements.get(match.group(1)) # Always None for @import rules, those have no url group
+        if data is None:
+            return match.group(0)
+        return css[match.start():match.start(1)] + data + css[match.end(1):match.end()] # Keeping the `url(` and any quotes around it as they were
+
+    return _RE_URL.sub(_embed, css) # Swapping every url in a single pass instead of rescanning the whole (growing) css once per url
+
+
+def test_resolve_css(css: AnyStr) -> AnyStr:
+    """
+    Fully resolves css, either a str or utf-8 encoded bytes.
+    Gives back the same type it was given
+    """
+    if isinstance(css, str):
+        return test_resolve_css(css.encode('utf-8')).decode('utf-8', errors='replace')
+    with _cache_scope():
+        return _resolve_css(css)[0]
+
+
+def _resolve_css(css: bytes) -> Tuple[bytes, bool]:
+    """
+    Gives `(resolved_css, cut)`, where `cut` says a circular import got dropped somewhere below this css.
+    What got dropped depends on the imports above it, so a cut result is only right where it was made and never gets cached
+    """
+    key = hashlib.sha1(css).digest()
+    with _cache_lock:
+        cached = _caches.get().resolved.get(key)
+    if cached is not None:
+        return cached, False # The same css got resolved already, like a reset sheet imported in a few places under different urls
+
     embedded = css
 
     imports = test_import_extractor(embedded)
-    embedded = test_import_resolver(imports, embedded)
+    embedded, cut = _embed_imports(imports, embedded) # Already inside the caller's cache scope
 
     assets = test_asset_extractor(embedded)
-    embedded = test_asset_resolver(assets, embedded)
+    embedded = _embed_assets(assets, embedded)
 
-    return embedded
+    if not cut:
+        with _cache_lock:
+            _caches.get().resolved[key] = embedded
+    return embedded, cut
 
 
 def test_extract(path: str, compress: bool = True) -> str:
@@ -154,25 +577,33 @@ def test_extract(path: str, compress: bool = True) -> str:
     Fully resolves a css file.
     `path` can either be a filepath or a URL.
     """
-    if path.startswith('http') and '://' in path:
-        if log_level in [1, 2]:
-            _log(f'Downloading css file: {path}')
-        css = requests.get(filepath, headers=headers).text
-    else:
-        if not os.path.exists(filepath):
-            _log(f'The path {filepath} does not exist. Skipping...')
-            return
-        with open(filepath, 'r') as f:
-            css = f.read()
-
-    embedded = resolve_css(css)
+    with _cache_scope(): # Every run starts fresh so changed files don't get served from a previous run, and nothing from it stays in memory afterwards
+        if path.startswith('http') and '://' in path:
+            if log_level in [1, 2]:
+                _log(f'Downloading css file: {path}')
+            response = _get_session().get(path, headers=headers, timeout=10)
+            css = _to_utf8(response.content, response.headers.get('content-type'))
+        else:
+            try:
+                with open(path, 'rb') as f:
+                    css = _to_utf8(f.read(), None)
+            except FileNotFoundError:
+                if log_level in [1, 2]:
+                    _log(f'The path {path} does not exist. Skipping...')
+                return
+
+        token = _resolving.set(frozenset([path])) # So imports pointing back at this file count as circular too
+        try:
+            embedded = _resolve_css(css)[0]
+        finally:
+            _resolving.reset(token)
 
-    if compress:
-        if log_level in [1, 2]:
-            _log(f'Compressing css...')
-        embedded = minify_css(embedded)
+        if compress:
+            if log_level in [1, 2]:
+                _log(f'Compressing css...')
+            embedded = test_minify_css(embedded)
 
-    return embedded
+        return embedded.decode('utf-8', errors='replace') # Everything up to here works on bytes, so this is the only decode
 
 
 __all__ = [
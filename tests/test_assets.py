@@ -0,0 +1,106 @@
+import base64
+import contextlib
+import random
+import unittest
+import urllib.parse
+from unittest import mock
+
+from css_resolver import resolver
+
+
+PNG = bytes(range(256)) * 41 + b'\x89PNG' # Not a multiple of 3 long
+SVG = b'<svg xmlns="http://www.w3.org/2000/svg"><rect width="1" height="1"/></svg>'
+
+
+def _split(payload: bytes, rng: random.Random):
+    i = 0
+    while i < len(payload):
+        size = rng.randint(0, 10) # Empty chunks included
+        yield payload[i:i + size]
+        i += size
+
+
+class DataUriTests(unittest.TestCase):
+    def test_base64_matches_whole_payload(self):
+        rng = random.Random(0)
+        expected = b'data:image/png;base64,' + base64.b64encode(PNG)
+        for _ in range(50):
+            self.assertEqual(resolver._data_uri('image/png', _split(PNG, rng)), expected)
+        for size in range(1, 8): # Every possible leftover length, a few chunks in a row
+            self.assertEqual(resolver._data_uri('image/png', (PNG[i:i + size] for i in range(0, len(PNG), size))), expected)
+
+    def test_empty_payload(self):
+        self.assertEqual(resolver._data_uri('image/png', []), b'data:image/png;base64,')
+
+    def test_svg_is_url_encoded(self):
+        data_uri = resolver._data_uri('image/svg+xml', _split(SVG, random.Random(1)))
+        self.assertEqual(data_uri, b'data:image/svg+xml,' + urllib.parse.quote(SVG, safe='').encode('ascii'))
+
+    def test_media_type_is_cleaned_up(self):
+        self.assertEqual(resolver._data_uri('image/svg+xml; charset="utf-8"', [b'<svg/>']), b'data:image/svg+xml;charset=utf-8,%3Csvg%2F%3E')
+        self.assertEqual(resolver._data_uri('Image/PNG; name="a b.png"', [b'abc']), b'data:image/png;base64,YWJj')
+        self.assertEqual(resolver._data_uri('image/png"); x', [b'abc']), b'data:application/octet-stream;base64,YWJj')
+        self.assertEqual(resolver._data_uri(None, [b'abc']), b'data:application/octet-stream;base64,YWJj')
+        self.assertEqual(resolver._data_uri('text/plain; charset="a\'b"', [b'a']), b'data:text/plain,a')
+
+    def test_svg_base64_when_asked(self):
+        with mock.patch.object(resolver, 'base64_text_assets', True):
+            self.assertEqual(resolver._data_uri('image/svg+xml', [SVG]), b'data:image/svg+xml;base64,' + base64.b64encode(SVG))
+
+
+class AssetResolverTests(unittest.TestCase):
+    """
+    Runs asset_resolver end to end with the downloads served from memory in small, uneven chunks
+    """
+    FILES = {
+        'http://t/i.png': (200, 'image/png', PNG),
+        'http://t/i.svg': (200, 'image/svg+xml', SVG),
+        'http://t/missing.png': (404, 'text/html', b'nope'),
+        'http://t/quoted.svg': (200, 'image/svg+xml; charset="utf-8"', SVG),
+    }
+
+    def setUp(self):
+        patches = [
+            mock.patch.object(resolver, 'log_method', 0),
+            mock.patch.object(resolver, '_stream', self._stream),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    @contextlib.contextmanager
+    def _stream(self, url: str):
+        status_code, content_type, payload = self.FILES[url]
+        yield status_code, content_type, _split(payload, random.Random(url))
+
+    def _resolve(self, css: bytes) -> bytes:
+        return resolver.asset_resolver(resolver.asset_extractor(css), css)
+
+    def test_assets_are_embedded(self):
+        css = b'a{background:url("http://t/i.png")}b{background:url(http://t/i.svg)}c{background:url(\'http://t/i.png\')}'
+        expected = (
+            b'a{background:url("data:image/png;base64,' + base64.b64encode(PNG) + b'")}'
+            b'b{background:url(data:image/svg+xml,' + urllib.parse.quote(SVG, safe='').encode('ascii') + b')}'
+            b'c{background:url(\'data:image/png;base64,' + base64.b64encode(PNG) + b'\')}'
+        )
+        substitutes = [('python', None)]
+        if resolver._css_resolver_c is not None:
+            substitutes.append(('compiled', resolver._css_resolver_c))
+        for name, extension in substitutes: # The base64 data uris come back as bytearrays, both substitutions have to take them
+            with self.subTest(name), mock.patch.object(resolver, '_css_resolver_c', extension):
+                self.assertEqual(self._resolve(css), expected)
+
+    def test_quoted_content_type_stays_valid_css(self):
+        css = b'a{background:url("http://t/quoted.svg")}'
+        self.assertEqual(self._resolve(css), b'a{background:url("data:image/svg+xml;charset=utf-8,' + urllib.parse.quote(SVG, safe='').encode('ascii') + b'")}')
+
+    def test_failed_and_data_urls_are_left_alone(self):
+        css = b'a{background:url(http://t/missing.png)}b{background:url(data:image/png;base64,AAAA)}'
+        self.assertEqual(self._resolve(css), css)
+
+    def test_str_in_str_out(self):
+        self.assertEqual(resolver.asset_resolver(['http://t/i.svg'], 'b{background:url(http://t/i.svg)}'), 'b{background:url(data:image/svg+xml,' + urllib.parse.quote(SVG, safe='') + ')}')
+
+
+if __name__ == '__main__':
+    unittest.main()
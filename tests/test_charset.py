@@ -0,0 +1,37 @@
+import codecs
+import unittest
+
+from css_resolver import resolver
+
+
+LATIN1_CSS = 'a{content:"é"}'.encode('iso-8859-1')
+UTF8_CSS = 'a{content:"é"}'.encode('utf-8')
+
+
+class ToUtf8Tests(unittest.TestCase):
+    def test_utf8_by_default(self):
+        self.assertEqual(resolver._to_utf8(UTF8_CSS, None), UTF8_CSS)
+        self.assertEqual(resolver._to_utf8(UTF8_CSS, 'text/css'), UTF8_CSS)
+
+    def test_charset_rule(self):
+        self.assertEqual(resolver._to_utf8(b'@charset "iso-8859-1";\n' + LATIN1_CSS, 'text/css'), UTF8_CSS)
+
+    def test_content_type_beats_charset_rule(self):
+        css = '@charset "iso-8859-1";a{content:"€"}'.encode('windows-1252')
+        self.assertEqual(resolver._to_utf8(css, 'text/css; charset="windows-1252"'), 'a{content:"€"}'.encode('utf-8'))
+
+    def test_bom_beats_content_type_and_charset_rule(self):
+        css = codecs.BOM_UTF8 + b'@charset "iso-8859-1";' + UTF8_CSS
+        self.assertEqual(resolver._to_utf8(css, 'text/css; charset=iso-8859-1'), UTF8_CSS)
+
+    def test_unknown_charset_falls_back_to_utf8(self):
+        self.assertEqual(resolver._to_utf8(UTF8_CSS, 'text/css; charset=not-a-charset'), UTF8_CSS)
+        self.assertEqual(resolver._to_utf8(b'@charset "not-a-charset";' + UTF8_CSS, None), UTF8_CSS)
+
+    def test_charset_rule_is_only_read_at_the_start(self):
+        css = b'a{}@charset "iso-8859-1";'
+        self.assertEqual(resolver._to_utf8(css, None), css)
+
+
+if __name__ == '__main__':
+    unittest.main()
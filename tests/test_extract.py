@@ -0,0 +1,52 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from css_resolver import resolver
+
+
+class ExtractTests(unittest.TestCase):
+    def setUp(self):
+        patches = [
+            mock.patch.object(resolver, 'log_method', 0),
+            mock.patch.object(resolver, 'filepath', ''), # extract() has to go by its own argument, not the CLI global
+            mock.patch.object(resolver, '_fetch', side_effect=self._get),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def _get(self, url: str):
+        if url == 'http://t/a.css':
+            return 200, 'text/css', b'.a { color : red }'
+        return 404, 'text/html', b''
+
+    def _write(self, name: str, css: bytes) -> str:
+        path = os.path.join(self.directory, name)
+        with open(path, 'wb') as f:
+            f.write(css)
+        return path
+
+    def test_local_file(self):
+        path = self._write('style.css', b'/* header */\n@import "http://t/a.css";\n.b {\n\tcolor: blue;\n}\n')
+        self.assertEqual(resolver.extract(path), '.a { color : red } .b { color: blue; }')
+
+    def test_local_file_without_compressing(self):
+        path = self._write('style.css', b'.b {\n\tcolor: blue;\n}\n')
+        self.assertEqual(resolver.extract(path, compress=False), '.b {\n\tcolor: blue;\n}\n')
+
+    def test_local_file_charset(self):
+        path = self._write('latin.css', '@charset "iso-8859-1";\n.l{content:"é"}'.encode('iso-8859-1'))
+        self.assertEqual(resolver.extract(path), '.l{content:"é"}')
+
+    def test_missing_file_returns_none(self):
+        self.assertIsNone(resolver.extract(os.path.join(self.directory, 'missing.css')))
+
+
+if __name__ == '__main__':
+    unittest.main()
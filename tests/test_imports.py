@@ -0,0 +1,101 @@
+import threading
+import time
+import unittest
+from unittest import mock
+
+from css_resolver import resolver
+
+
+class ImportTests(unittest.TestCase):
+    """
+    Runs the resolver against an in memory set of stylesheets instead of the network
+    """
+    def setUp(self):
+        self.files = {}
+        self.content_types = {}
+        self.delays = {}
+        patches = [
+            mock.patch.object(resolver, 'log_method', 0),
+            mock.patch.object(resolver, '_fetch', side_effect=self._get),
+            mock.patch.object(resolver, '_fetch_asset', side_effect=AssertionError('no assets should be downloaded')),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def _get(self, url: str):
+        time.sleep(self.delays.get(url, 0))
+        if url not in self.files:
+            return 404, 'text/html', b''
+        return 200, self.content_types.get(url, 'text/css'), self.files[url]
+
+    def test_circular_import_is_dropped(self):
+        self.files['http://t/a.css'] = b'@import url(http://t/b.css);\n.a{}'
+        self.files['http://t/b.css'] = b'@import url(http://t/a.css);\n.b{}'
+        self.assertEqual(resolver.resolve_css(b'@import url(http://t/a.css);'), b'\n.b{}\n.a{}')
+
+    def test_self_import_is_dropped(self):
+        self.files['http://t/a.css'] = b'@import "http://t/a.css";.a{}'
+        self.assertEqual(resolver.resolve_css(b'@import "http://t/a.css";'), b'.a{}')
+
+    def test_shared_import_is_not_circular(self):
+        self.files['http://t/a.css'] = b'@import "http://t/c.css";.a{}'
+        self.files['http://t/b.css'] = b'@import "http://t/c.css";.b{}'
+        self.files['http://t/c.css'] = b'.c{}'
+        self.assertEqual(resolver.resolve_css(b'@import "http://t/a.css";@import "http://t/b.css";'), b'.c{}.a{}.c{}.b{}')
+
+    def test_cycle_cut_results_are_not_reused(self):
+        self.files['http://t/a.css'] = b'@import "http://t/b.css";.a{}'
+        self.files['http://t/b.css'] = b'@import "http://t/a.css";.b{}'
+        self.files['http://t/x.css'] = b'@import "http://t/b.css";.x{}'
+        css = b'@import "http://t/a.css";@import "http://t/x.css";'
+        for slow in ['http://t/a.css', 'http://t/x.css']: # b.css resolved under a.css has a.css cut out, so x.css must not get that copy
+            with self.subTest(slow=slow):
+                self.delays = {slow: 0.2}
+                self.assertEqual(resolver.resolve_css(css), b'.b{}.a{}.a{}.b{}.x{}')
+
+    def test_shared_import_is_downloaded_once(self):
+        self.files['http://t/a.css'] = b'@import "http://t/c.css";.a{}'
+        self.files['http://t/b.css'] = b'@import "http://t/c.css";.b{}'
+        self.files['http://t/c.css'] = b'.c{}'
+        self.delays['http://t/c.css'] = 0.2 # Both branches ask for c.css while the first download is still going
+        self.assertEqual(resolver.resolve_css(b'@import "http://t/a.css";@import "http://t/b.css";'), b'.c{}.a{}.c{}.b{}')
+        self.assertEqual([call.args[0] for call in resolver._fetch.call_args_list].count('http://t/c.css'), 1)
+
+    def test_unresolved_imports_are_left_alone(self):
+        css = b'@import url(http://t/print.css) print;@import url(http://t/missing.css);'
+        self.files['http://t/print.css'] = b'.p{}'
+        self.assertEqual(resolver.resolve_css(css), css) # Not fetched as assets either, see setUp
+
+    def test_imports_are_decoded_by_their_charset(self):
+        self.files['http://t/header.css'] = '.h{content:"é"}'.encode('iso-8859-1')
+        self.content_types['http://t/header.css'] = 'text/css; charset=iso-8859-1'
+        self.files['http://t/rule.css'] = '@charset "iso-8859-1";.r{content:"é"}'.encode('iso-8859-1')
+        css = resolver.resolve_css(b'@import "http://t/header.css";@import "http://t/rule.css";')
+        self.assertEqual(css, '.h{content:"é"}.r{content:"é"}'.encode('utf-8'))
+
+    def test_str_in_str_out(self):
+        self.files['http://t/a.css'] = b'.a{}'
+        self.assertEqual(resolver.resolve_css('@import "http://t/a.css";'), '.a{}')
+
+    def test_each_call_starts_fresh(self):
+        self.files['http://t/a.css'] = b'.old{}'
+        self.assertEqual(resolver.resolve_css(b'@import "http://t/a.css";'), b'.old{}')
+        self.files['http://t/a.css'] = b'.new{}'
+        self.assertEqual(resolver.resolve_css(b'@import "http://t/a.css";'), b'.new{}')
+        self.assertIsNone(resolver._caches.get())
+
+    def test_overlapping_calls_dont_share_caches(self):
+        self.files['http://t/a.css'] = b'.old{}'
+        self.files['http://t/slow.css'] = b'.slow{}'
+        self.delays['http://t/slow.css'] = 0.3
+        slow = threading.Thread(target=resolver.resolve_css, args=(b'@import "http://t/a.css";@import "http://t/slow.css";',))
+        slow.start()
+        time.sleep(0.1) # a.css is cached by the slow call by now
+        self.files['http://t/a.css'] = b'.new{}'
+        self.assertEqual(resolver.resolve_css(b'@import "http://t/a.css";'), b'.new{}')
+        slow.join()
+
+
+if __name__ == '__main__':
+    unittest.main()
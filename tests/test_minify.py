@@ -0,0 +1,97 @@
+import random
+import unittest
+from unittest import mock
+
+from css_resolver import resolver
+from css_resolver.resolver import _css_resolver_c
+
+
+def _python_minify(css: bytes) -> bytes:
+    with mock.patch.object(resolver, '_css_resolver_c', None), mock.patch.object(resolver, 'use_rcssmin', False):
+        return resolver.minify_css(css)
+
+
+MINIFIERS = [('python', _python_minify)]
+if _css_resolver_c is not None:
+    MINIFIERS.append(('compiled', _css_resolver_c.minify_css))
+
+
+class MinifyTests(unittest.TestCase):
+    def assertMinifies(self, css: bytes, expected: bytes) -> None:
+        for name, minify in MINIFIERS:
+            with self.subTest(name):
+                self.assertEqual(minify(css), expected)
+
+    def test_comments_and_whitespace(self):
+        self.assertMinifies(b'  a /* one */ b  /* two */  c  ', b'a b c')
+        self.assertMinifies(b'a {\n\tcolor: red;\n}\n', b'a { color: red; }')
+
+    def test_comment_inside_string_is_kept(self):
+        self.assertMinifies(b'a { content: "/* not a comment */   x"; }', b'a { content: "/* not a comment */   x"; }')
+        self.assertMinifies(b"a { content: '/* not a comment */'; }", b"a { content: '/* not a comment */'; }")
+
+    def test_escaped_quotes(self):
+        self.assertMinifies(b'a{content:"say \\"/* hi */\\""}', b'a{content:"say \\"/* hi */\\""}')
+        self.assertMinifies(b"a{content:'it\\'s  /* x */'}", b"a{content:'it\\'s  /* x */'}")
+        self.assertMinifies(b'a{content:"\\\\"/* gone */b{}', b'a{content:"\\\\"b{}') # Escaped backslash, so the quote after it does close the string
+
+    def test_unterminated_comment_is_left_alone(self):
+        self.assertMinifies(b'a { b: c } /* never closed   ', b'a { b: c } /* never closed')
+
+    def test_unterminated_string(self):
+        self.assertMinifies(b'a{content:"never  closed', b'a{content:"never  closed')
+
+    def test_unquoted_url_is_left_alone(self):
+        self.assertMinifies(b'a{background:url(x  /*y*/.png)} b  c', b'a{background:url(x  /*y*/.png)} b c')
+
+    def test_str_in_str_out(self):
+        self.assertEqual(resolver.minify_css('a  b /* c */ \u00e9'), 'a b \u00e9')
+
+
+class SubstituteUrlsTests(unittest.TestCase):
+    def assertSubstitutes(self, css: bytes, replacements: dict, expected: bytes) -> None:
+        substitutes = [('python', resolver._substitute_urls)]
+        if _css_resolver_c is not None:
+            substitutes.append(('compiled', _css_resolver_c.substitute_urls))
+        for name, substitute in substitutes:
+            with self.subTest(name):
+                self.assertEqual(substitute(css, replacements), expected)
+
+    def test_quotes_are_kept(self):
+        self.assertSubstitutes(b'a{b:url("x.png")} c{d:url(\'x.png\')} e{f:url(x.png)}', {b'x.png': b'data:,'}, b'a{b:url("data:,")} c{d:url(\'data:,\')} e{f:url(data:,)}')
+
+    def test_import_rules_are_skipped(self):
+        self.assertSubstitutes(b'@import url(x.css) print;a{b:url(x.css)}', {b'x.css': b'data:,'}, b'@import url(x.css) print;a{b:url(data:,)}')
+
+    def test_bytearray_replacement(self):
+        self.assertSubstitutes(b'a{b:url(x.png)}', {b'x.png': bytearray(b'data:,')}, b'a{b:url(data:,)}')
+
+
+@unittest.skipIf(_css_resolver_c is None, 'compiled extension is not built')
+class CompiledParityTests(unittest.TestCase):
+    """
+    Random css made out of the tricky bits, which the compiled and pure python versions have to agree on
+    """
+    PIECES = [b'/*', b'*/', b'"', b"'", b'\\', b' ', b'\n', b'\t', b'url(', b'URL(', b')', b'@import', b';', b'a', b'b', b'x.png', b'{', b'}']
+
+    def _random_css(self, rng: random.Random) -> bytes:
+        return b''.join(rng.choice(self.PIECES) for _ in range(rng.randint(0, 40)))
+
+    def test_minify_parity(self):
+        rng = random.Random(0)
+        for _ in range(20000):
+            css = self._random_css(rng)
+            self.assertEqual(_css_resolver_c.minify_css(css), _python_minify(css), css)
+
+    def test_substitute_parity(self):
+        rng = random.Random(1)
+        for _ in range(20000):
+            css = self._random_css(rng)
+            urls = [match.group(1) for match in resolver._RE_URL.finditer(css) if match.group(1) is not None]
+            replacements = {url: b'data:' + url for url in urls if rng.random() < 0.7}
+            replacements[b'x.png'] = b'data:,'
+            self.assertEqual(_css_resolver_c.substitute_urls(css, replacements), resolver._substitute_urls(css, replacements), css)
+
+
+if __name__ == '__main__':
+    unittest.main()